@@ -1,18 +1,14 @@
 """client implementation"""
 
-import logging
 import os
 import time
 import subprocess
-from typing import List, Dict, Any
-from .transport import request, RPCMessage
+from typing import List, Dict, Any, Callable, Optional
+from .log import get_logger
+from .transport import request_batch, request_sync, submit
+from .transport import is_server_listening, RPCMessage
 
-LOGGER = logging.getLogger(__name__)
-# LOGGER.setLevel(logging.DEBUG)
-STREAM_HANDLER = logging.StreamHandler()
-LOG_TEMPLATE = "%(levelname)s %(asctime)s %(filename)s:%(lineno)s  %(message)s"
-STREAM_HANDLER.setFormatter(logging.Formatter(LOG_TEMPLATE))
-LOGGER.addHandler(STREAM_HANDLER)
+LOGGER = get_logger(__name__)
 
 # RPC error code
 INTERNAL_ERROR = 5001
@@ -33,94 +29,189 @@ def run_server(cmd: List[str], workdir: str, envs=None):
     r"""run server with specific environment
 
     windows command:
-      ~\miniconda3\Script\activate envqt && python server
+      ~\miniconda3\envs\envqt\python.exe server\app.py
 
     """
 
-    if os.name == "nt":
-        # if on Windows, hide process window
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.SW_HIDE | subprocess.STARTF_USESHOWWINDOW
-    else:
-        startupinfo = None
+    # if on Windows, don't create console window
+    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
 
     server_proc = subprocess.Popen(
         cmd,
-        shell=True,
         cwd=workdir,
-        # env=env,
-        startupinfo=startupinfo,
+        env=envs,
+        stdin=subprocess.DEVNULL,
+        creationflags=creationflags,
     )
 
-    time.sleep(5)
-    exit_code = server_proc.poll()
-    if exit_code:
-        if exit_code == EXIT_ADDRESS_IN_USE:
-            raise AddressInUse("socket address in use")
-        raise OSError(f"server terminated with exit code {exit_code}")
+    # wait until server ready or terminated
+    deadline = time.monotonic() + 10
+    delay = 0.05
+    while time.monotonic() < deadline:
+        exit_code = server_proc.poll()
+        if exit_code:
+            if exit_code == EXIT_ADDRESS_IN_USE:
+                raise AddressInUse("socket address in use")
+            raise OSError(f"server terminated with exit code {exit_code}")
+
+        if is_server_listening():
+            return
+
+        time.sleep(delay)
+        delay = min(delay * 2, 1)
+
+
+ResponseCallback = Optional[Callable[[RPCMessage], None]]
+ErrorCallback = Optional[Callable[[Exception], None]]
+
+# request options by method, stale completion and hover request discarded
+# if sent in background
+REQUEST_OPTIONS = {
+    "change_workspace": {"key": "change_workspace"},
+    "document_completion": {"key": "document_completion"},
+    "document_hover": {"key": "document_hover", "timeout": 10},
+}
+
+
+def _call(
+    method: str,
+    params: Dict[str, Any] = None,
+    callback: ResponseCallback = None,
+    on_error: ErrorCallback = None,
+    batch: Optional["Batch"] = None,
+    key: Optional[str] = None,
+):
+    """send request, in background if callback defined
+
+    If batch defined, request is deferred until batch sent. Background request
+    coalesced by 'key', default from REQUEST_OPTIONS.
+    """
+
+    message = RPCMessage.request(method=method, params=params)
+    if batch is not None:
+        batch.add(message, callback)
+        return None
+
+    options = REQUEST_OPTIONS.get(method, {})
+    timeout = options.get("timeout", 60)
+
+    if callback:
+        submit(
+            message,
+            callback,
+            key=key or options.get("key"),
+            on_error=on_error,
+            timeout=timeout,
+        )
+        return None
+    return request_sync(message, timeout=timeout)
 
 
-def shutdown():
+def shutdown(callback=None, on_error=None):
     """shutdown server"""
-    request(RPCMessage.request(method="shutdown", params=None))
+    _call("shutdown", None, callback, on_error)
 
 
-def initialize(workspace_path=None, **kwargs):
+def initialize(workspace_path=None, callback=None, on_error=None, batch=None, **kwargs):
     """initialize project"""
 
     params = {"workspace": {"path": workspace_path}}
     params.update(kwargs)
-    response = request(RPCMessage.request(method="initialize", params=params))
-    return response
+    return _call("initialize", params, callback, on_error, batch)
 
 
-def change_workspace(workspace_path):
+def change_workspace(workspace_path, callback=None, on_error=None):
     """change workspace path"""
+    return _call("change_workspace", {"path": workspace_path}, callback, on_error)
 
-    params = {"path": workspace_path}
-    response = request(RPCMessage.request(method="change_workspace", params=params))
-    return response
 
-
-def exit():
+def exit(callback=None, on_error=None):
     """exit project"""
-    request(RPCMessage.request(method="exit", params=None))
+    _call("exit", None, callback, on_error)
 
 
-def document_completion(source, row, column):
+def document_completion(source, row, column, callback=None, on_error=None, batch=None):
     """document_completion request"""
 
     params = {"source": source, "row": row, "column": column}
-    response = request(RPCMessage.request(method="document_completion", params=params))
-    return response
+    return _call("document_completion", params, callback, on_error, batch)
 
 
-def document_hover(source, row, column):
+def document_hover(source, row, column, callback=None, on_error=None):
     """document_hover request"""
 
     params = {"source": source, "row": row, "column": column}
-    response = request(
-        RPCMessage.request(method="document_hover", params=params), timeout=10
-    )
-    return response
+    return _call("document_hover", params, callback, on_error)
 
 
-def document_formatting(source):
+def document_formatting(source, callback=None, on_error=None):
     """document_formatting request"""
+    return _call("document_formatting", {"source": source}, callback, on_error)
 
-    params = {"source": source}
-    response = request(RPCMessage.request(method="document_formatting", params=params))
-    return response
 
-
-def document_publish_diagnostic(*, source: str, path: str):
+def document_publish_diagnostic(
+    *, source: str, path: str, callback=None, on_error=None
+):
     """document_publish_diagnostic request"""
 
     params = {"source": source, "path": path}
-    response = request(
-        RPCMessage.request(method="document_publish_diagnostic", params=params)
-    )
-    return response
+    # only latest diagnostic for each document matter
+    key = f"document_publish_diagnostic:{path}"
+    return _call("document_publish_diagnostic", params, callback, on_error, key=key)
+
+
+class Batch:
+    """collect request messages, sent at once on exit
+
+    >>> with Batch() as batch:
+    ...     batch.add(RPCMessage.request("document_hover", params))
+    ...     batch.add(RPCMessage.request("document_completion", params))
+    >>> hover, completion = batch.responses
+
+    If any message added with callback, batch is sent in background and each
+    response passed to its callback. Pending batch with same methods
+    is discarded.
+    """
+
+    def __init__(self, timeout=60, on_error: ErrorCallback = None):
+        self.timeout = timeout
+        self.on_error = on_error
+        self.messages: List[RPCMessage] = []
+        self.callbacks: List[ResponseCallback] = []
+        self.responses: List[RPCMessage] = []
+
+    def add(self, message: RPCMessage, callback: ResponseCallback = None):
+        self.messages.append(message)
+        self.callbacks.append(callback)
+
+    def _dispatch(self, responses: List[RPCMessage]):
+        self.responses = responses
+        for callback, response in zip(self.callbacks, responses):
+            if not callback:
+                continue
+            try:
+                callback(response)
+            except Exception:
+                LOGGER.error("callback error", exc_info=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None or not self.messages:
+            return
+
+        if any(self.callbacks):
+            key = "+".join(message["method"] for message in self.messages)
+            submit(
+                self.messages,
+                self._dispatch,
+                key=key,
+                on_error=self.on_error,
+                timeout=self.timeout,
+            )
+        else:
+            self.responses = request_batch(self.messages, timeout=self.timeout)
 
 
 class Session:
@@ -129,6 +220,8 @@ class Session:
     def __init__(self, config: Dict[str, Any] = None):
         self.active = False
         self.config = config or {}
+        # workspace path known by server
+        self.workspace_path = None
 
     def start(self, workspace_path, config: Dict[str, Any] = None):
         config = config or self.config
@@ -139,6 +232,62 @@ class Session:
             LOGGER.debug("start session failed")
         else:
             self.active = True
+            self.workspace_path = workspace_path
+
+    def start_async(
+        self,
+        workspace_path,
+        on_error: ErrorCallback = None,
+        batch: Optional[Batch] = None,
+    ):
+        """start session in background, or with next requests in batch"""
+
+        def on_initialized(response):
+            self.active = True
+            self.workspace_path = workspace_path
+
+        LOGGER.debug("initialize")
+        initialize(
+            workspace_path=workspace_path,
+            callback=on_initialized,
+            on_error=on_error,
+            batch=batch,
+            **self.config,
+        )
+
+    def change_workspace(self, workspace_path, on_error: ErrorCallback = None):
+        """change workspace in background, skipped if path unchanged"""
+
+        if workspace_path == self.workspace_path:
+            return
+
+        def on_changed(response):
+            LOGGER.debug(response)
+            if "error" in response:
+                self.workspace_path = None
+
+        def on_change_error(err: Exception):
+            self.workspace_path = None
+            if on_error:
+                on_error(err)
+
+        self.workspace_path = workspace_path
+        change_workspace(workspace_path, callback=on_changed, on_error=on_change_error)
+
+    def batch(self, timeout=60, on_error: ErrorCallback = None) -> Batch:
+        """batch requests in single round trip"""
+        return Batch(timeout, on_error)
+
+    def exit_async(self, on_error: ErrorCallback = None):
+        """exit session in background"""
+
+        def on_exit(response):
+            LOGGER.debug("exit session")
+
+        LOGGER.debug("exit")
+        self.active = False
+        self.workspace_path = None
+        exit(callback=on_exit, on_error=on_error)
 
     def exit(self):
         try:
@@ -148,3 +297,4 @@ class Session:
             LOGGER.debug("exit session")
         finally:
             self.active = False
+            self.workspace_path = None
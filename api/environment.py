@@ -5,7 +5,8 @@
 
 import os
 import glob
-from typing import Iterator, List
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
 
 if os.name == "nt":
     PYTHON_EXECUTABLE = "python.exe"
@@ -15,20 +16,40 @@ else:
     ACTIVATE_PATH = "bin/activate"
 
 
-def get_all_interpreter() -> Iterator[str]:
-    """Get all interpreter
+def _iter_conda_interpreter(home: str) -> Iterator[str]:
+    """iterate conda base and envs interpreter in default install directory"""
 
-    Currently only find python interpreter in PATH and default conda install directory.
-    Path may be duplicated caused by search in PATH and conda environment.
-    """
+    try:
+        entries = list(os.scandir(home))
+    except OSError:
+        return
+
+    for entry in entries:
+        if "conda" not in entry.name or entry.name.startswith("."):
+            continue
+        if not entry.is_dir():
+            continue
+
+        base = os.path.join(entry.path, PYTHON_EXECUTABLE)
+        if not os.path.isfile(base):
+            continue
+        yield base
+
+        try:
+            envs = list(os.scandir(os.path.join(entry.path, "envs")))
+        except OSError:
+            continue
+        for env in envs:
+            interpreter = os.path.join(env.path, PYTHON_EXECUTABLE)
+            if env.is_dir() and os.path.isfile(interpreter):
+                yield interpreter
+
+
+def _iter_interpreter() -> Iterator[str]:
     home = os.path.expanduser("~")
 
     # find conda
-    conda = glob.glob(home + "/*conda*/" + PYTHON_EXECUTABLE)
-    if conda:
-        yield from iter(conda)
-        conda_envs = glob.glob(home + "/*conda*/envs/*/" + PYTHON_EXECUTABLE)
-        yield from iter(conda_envs)
+    yield from _iter_conda_interpreter(home)
 
     for path in os.environ["PATH"].split(os.pathsep):
         test_path = os.path.join(path, PYTHON_EXECUTABLE)
@@ -36,8 +57,23 @@ def get_all_interpreter() -> Iterator[str]:
             yield test_path
 
 
+@lru_cache(maxsize=1)
+def get_all_interpreter() -> Tuple[str, ...]:
+    """Get all interpreter
+
+    Currently only find python interpreter in PATH and default conda install directory.
+    Path may be duplicated caused by search in PATH and conda environment.
+    Result is cached, interpreter installed after first call is not listed.
+    """
+    return tuple(_iter_interpreter())
+
+
+@lru_cache(maxsize=32)
 def get_envs_activate_command(interpreter: str) -> str:
-    """Get envs activate command"""
+    """Get envs activate command
+
+    Result is cached by interpreter.
+    """
 
     # where python installed
     base_path = interpreter[: -len(PYTHON_EXECUTABLE)]
@@ -53,11 +89,42 @@ def get_envs_activate_command(interpreter: str) -> str:
             return f"{path} {base_path}"
 
 
+def get_envs_paths(interpreter: str) -> List[str]:
+    """Get directories added to PATH while environment activated"""
+    return list(_get_envs_paths(interpreter))
+
+
+@lru_cache(maxsize=32)
+def _get_envs_paths(interpreter: str) -> Tuple[str, ...]:
+    base_path = os.path.dirname(interpreter)
+    if os.name == "nt":
+        # conda envs on Windows
+        paths = [
+            base_path,
+            os.path.join(base_path, "Library", "mingw-w64", "bin"),
+            os.path.join(base_path, "Library", "usr", "bin"),
+            os.path.join(base_path, "Library", "bin"),
+            os.path.join(base_path, "Scripts"),
+            os.path.join(base_path, "bin"),
+        ]
+    else:
+        paths = [base_path]
+    return tuple(path for path in paths if os.path.isdir(path))
+
+
+def get_python_exec_env(interpreter: str) -> Dict[str, str]:
+    """Get environment variables of activated environment"""
+
+    env = os.environ.copy()
+    env["PATH"] = os.pathsep.join(get_envs_paths(interpreter) + [env.get("PATH", "")])
+    return env
+
+
 def get_python_exec_command(interpreter: str, target="") -> List[str]:
     """Get python exec commands
 
-    Return list of command to execute target with specific environment activated
+    Return list of command to execute target with interpreter directly, run it with
+    environment from get_python_exec_env() to have environment activated.
     """
 
-    activate = get_envs_activate_command(interpreter).split()
-    return activate + ["&&", "python", target]
+    return [interpreter, target]
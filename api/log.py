@@ -0,0 +1,46 @@
+"""plugin logger"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_TEMPLATE = "%(levelname)s %(asctime)s %(filename)s:%(lineno)s  %(message)s"
+
+# debug log written to stream in background thread
+_LOG_QUEUE = queue.SimpleQueue()
+_QUEUE_HANDLER = QueueHandler(_LOG_QUEUE)
+_LISTENER = None
+
+# warning and error always printed
+_STREAM_HANDLER = logging.StreamHandler()
+_STREAM_HANDLER.setLevel(logging.WARNING)
+_STREAM_HANDLER.setFormatter(logging.Formatter(LOG_TEMPLATE))
+
+
+def _start_listener():
+    global _LISTENER
+
+    if _LISTENER:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_TEMPLATE))
+    _LISTENER = QueueListener(_LOG_QUEUE, stream_handler, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """get logger, debug log discarded unless PYTOOLS_DEBUG environment variable set"""
+
+    logger = logging.getLogger(name)
+    if os.environ.get("PYTOOLS_DEBUG"):
+        _start_listener()
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(_QUEUE_HANDLER)
+    else:
+        logger.setLevel(logging.WARNING)
+        logger.addHandler(_STREAM_HANDLER)
+    return logger
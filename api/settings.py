@@ -1,14 +1,28 @@
 """editor settings"""
 
 from contextlib import contextmanager
+from typing import Any, Dict, Iterable
 import sublime
 
+# loaded settings object is live, changes reflected without reload
+_LOADED_SETTINGS: Dict[str, sublime.Settings] = {}
+
+
+def load_settings(base_name) -> sublime.Settings:
+    """load settings, cached by base_name"""
+    try:
+        return _LOADED_SETTINGS[base_name]
+    except KeyError:
+        settings = sublime.load_settings(base_name)
+        _LOADED_SETTINGS[base_name] = settings
+        return settings
+
 
 @contextmanager
 def open_settings(base_name, save=False):
     """open settings with context manager"""
     try:
-        yield sublime.load_settings(base_name)
+        yield load_settings(base_name)
 
     finally:
         if save:
@@ -20,8 +34,11 @@ class Settings:
         self.base_name = base_name
 
     def get(self, name, default=None):
-        with open_settings(self.base_name) as s:
-            return s.get(name, default)
+        return load_settings(self.base_name).get(name, default)
+
+    def get_many(self, names: Iterable[str], default=None) -> Dict[str, Any]:
+        s = load_settings(self.base_name)
+        return {name: s.get(name, default) for name in names}
 
     def set(self, name, value):
         with open_settings(self.base_name, True) as s:
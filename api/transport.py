@@ -1,65 +1,122 @@
+import atexit
+import errno
+import itertools
 import json
-import re
+import os
+import queue
+import select
 import socket
-from typing import Union
+import tempfile
+import threading
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from .log import get_logger
+
+LOGGER = get_logger(__name__)
+
+# use faster json library if available
+try:
+    import orjson
+
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+
+except ImportError:
+    try:
+        import ujson as _json
+
+        def json_dumps(obj) -> bytes:
+            return _json.dumps(obj).encode()
+
+    except ImportError:
+        _json = json
+
+        def json_dumps(obj) -> bytes:
+            # compact separator, smaller payload
+            return _json.dumps(obj, separators=(",", ":")).encode()
+
+    def json_loads(data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return _json.loads(data)
 
 
 class ContentIncomplete(ValueError):
     """expected size < defined size in header"""
 
 
-class ContentOverlow(ValueError):
+class ContentOverflow(ValueError):
     """expected size > defined size in header"""
 
 
+# backward compatible misspelled name
+ContentOverlow = ContentOverflow
+
+
+class RequestCancelled(Exception):
+    """request cancelled before response received"""
+
+
 class RPCErrorMessage(dict):
     """RPCErrorMessage"""
 
+    __slots__ = ()
+
     def __init__(self, code: int, message: str = "", **kwargs):
-        super().__init__({"code": code, "message": message})
-        self.update(kwargs)
+        super().__init__(code=code, message=message, **kwargs)
+
+
+# prebuilt header for common small message size
+_HEADERS = [b"Content-Length: %d\r\n\r\n" % size for size in range(4096)]
 
 
 class RPCMessage(dict):
     """RPCMessage"""
 
+    __slots__ = ()
+
     def to_bytes(self):
-        content = json.dumps(self)
-        content_encoded = content.encode()
-        header = f"Content-Length: {len(content_encoded)}"
-        return b"%s\r\n\r\n%s" % (header.encode("ascii"), content_encoded)
+        content = json_dumps(self)
+        size = len(content)
+        if size < len(_HEADERS):
+            return _HEADERS[size] + content
+        return b"Content-Length: %d\r\n\r\n" % size + content
 
     @classmethod
     def request(cls, method, params=None):
         if params is None:
             params = {}
-        return cls({"method": method, "params": params})
+        return cls(method=method, params=params)
 
     @classmethod
     def response(cls, result=None, error=None):
         if error:
-            return cls({"error": error})
-        return cls({"result": result})
-
-    _content_length_pattern = re.compile(r"Content-Length: (\d+)")
+            return cls(error=error)
+        return cls(result=result)
 
     @staticmethod
-    def get_content_length(header):
-        for line in header.splitlines():
-            match = RPCMessage._content_length_pattern.match(line)
-            if match:
-                return int(match.group(1))
-        raise ValueError("unable get 'Content-Length'")
+    def get_content_length(header: bytes) -> int:
+        start = header.find(b"Content-Length:")
+        if start < 0:
+            raise ValueError("unable get 'Content-Length'")
+
+        start += len(b"Content-Length:")
+        end = header.find(b"\r\n", start)
+        try:
+            return int(header[start:end] if end > -1 else header[start:])
+        except ValueError as err:
+            raise ValueError("invalid 'Content-Length'") from err
 
     @classmethod
     def from_bytes(cls, b: bytes, /):
-        try:
-            header, content = b.split(b"\r\n\r\n")
-        except Exception as err:
-            raise ValueError("unable get header") from err
-        content_length = cls.get_content_length(header.decode("ascii"))
+        header_end = b.find(b"\r\n\r\n")
+        if header_end < 0:
+            raise ValueError("unable get header")
+        content_length = cls.get_content_length(b[:header_end])
 
-        expected_length = len(content)
+        content_start = header_end + 4
+        expected_length = len(b) - content_start
         if expected_length < content_length:
             raise ContentIncomplete(
                 f"want {content_length}, expected {expected_length}"
@@ -67,43 +124,521 @@ class RPCMessage(dict):
         elif expected_length > content_length:
             raise ContentOverflow(f"want {content_length}, expected {expected_length}")
 
+        return cls.from_content(b[content_start:])
+
+    @classmethod
+    def from_content(cls, content: Union[bytes, memoryview], /):
         try:
-            message = json.loads(content.decode())
+            message = json_loads(content)
         except Exception as err:
-            LOGGER.debug(content)
             raise ValueError("error parsing message") from err
         return cls(message)
 
 
-def request(message: Union[bytes, RPCMessage], *, timeout=60) -> RPCMessage:
+HEADER_SEPARATOR = b"\r\n\r\n"
+
+
+class _Connection:
+    """connected socket with reusable receive buffer"""
+
+    def __init__(self, sock: socket.socket, buffer: Optional[bytearray] = None):
+        self.sock = sock
+        self.buffer = bytearray(65536) if buffer is None else buffer
+        # size of received data not yet processed at buffer start
+        self._pending = 0
+        # socket become readable if waiting response must be cancelled
+        self._cancel: Optional[socket.socket] = None
+
+    def close(self):
+        self.sock.close()
+
+    def _wait_readable(self):
+        readable, _, _ = select.select(
+            [self.sock, self._cancel], [], [], self.sock.gettimeout()
+        )
+        if self._cancel in readable:
+            raise RequestCancelled
+        if not readable:
+            raise socket.timeout("timed out")
+
+    def _recv_into(self, view: memoryview) -> int:
+        if self._cancel:
+            self._wait_readable()
+        size = self.sock.recv_into(view)
+        if not size:
+            raise ConnectionResetError("connection closed by server")
+        return size
+
+    def recv_message(self) -> RPCMessage:
+        """receive single message, read exactly 'Content-Length' of content"""
+
+        buffer = self.buffer
+        offset = self._pending
+        self._pending = 0
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.connect(("127.0.0.1", 9005))
+        # read until header separator found
+        with memoryview(buffer) as view:
+            start = 0
+            while True:
+                header_end = buffer.find(HEADER_SEPARATOR, start, offset)
+                if header_end > -1:
+                    break
+                if offset == len(buffer):
+                    raise ValueError("header too large")
+                # separator may be split between previous and next chunk
+                start = max(offset - len(HEADER_SEPARATOR) + 1, 0)
+                offset += self._recv_into(view[offset:])
 
-        if isinstance(message, RPCMessage):
-            message = message.to_bytes()
+        content_length = RPCMessage.get_content_length(buffer[:header_end])
+        content_start = header_end + len(HEADER_SEPARATOR)
+        content_end = content_start + content_length
 
-        sock.sendall(message)
+        if content_end > len(buffer):
+            # don't keep large buffer for rarely large message
+            buffer = bytearray(content_end)
+            buffer[:offset] = self.buffer[:offset]
+
+        # read remaining content
+        with memoryview(buffer) as view:
+            while offset < content_end:
+                offset += self._recv_into(view[offset:content_end])
+
+        # parse content without copy if json library accept memoryview
+        with memoryview(buffer) as view:
+            message = RPCMessage.from_content(view[content_start:content_end])
+
+        # next pipelined message already received
+        if offset > content_end:
+            self._pending = offset - content_end
+            buffer[: self._pending] = buffer[content_end:offset]
+
+        return message
+
+    def communicate(
+        self,
+        message: bytes,
+        timeout,
+        count=1,
+        cancel: Optional[socket.socket] = None,
+    ) -> List[RPCMessage]:
+        """send message, return 'count' of response message
+
+        Raise RequestCancelled if 'cancel' socket readable while waiting response.
+        """
+
+        self.sock.settimeout(timeout)
+        self.sock.sendall(message)
+        self._cancel = cancel
+        try:
+            return [self.recv_message() for _ in range(count)]
+        finally:
+            self._cancel = None
+
+
+def get_server_address():
+    """unix socket path on POSIX, or TCP loopback address
+
+    Unix socket path may be defined in 'PYTOOLS_SOCKET' environment variable.
+    """
+
+    if os.name != "nt" and hasattr(socket, "AF_UNIX"):
+        return os.environ.get("PYTOOLS_SOCKET") or os.path.join(
+            tempfile.gettempdir(), "pytools-9005.sock"
+        )
+    return ("127.0.0.1", 9005)
+
+
+def create_connection(address, timeout=None) -> socket.socket:
+    """connect to unix socket path or TCP address"""
+
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    try:
+        if sock.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_QUICKACK"):
+                # linux only, don't delay ACK of response
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
         sock.settimeout(timeout)
+        sock.connect(address)
+    except FileNotFoundError as err:
+        sock.close()
+        # unix socket file not created, server not running
+        raise ConnectionRefusedError(errno.ECONNREFUSED, "server not running") from err
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class _ConnectionPool:
+    """keep connections alive to be reused by next request"""
+
+    def __init__(self, address, maxsize=4):
+        self.address = address
+        self._connections = queue.Queue(maxsize)
+
+    def _connect(self, timeout=None) -> _Connection:
+        return _Connection(create_connection(self.address, timeout))
+
+    def acquire(self, timeout=None):
+        """acquire connection, return (connection, reused)"""
+        try:
+            return self._connections.get_nowait(), True
+        except queue.Empty:
+            return self._connect(timeout), False
+
+    def release(self, connection: _Connection):
+        """return connection to pool, closed if pool is full"""
+        try:
+            self._connections.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def clear(self):
+        """close all pooled connection"""
+        while True:
+            try:
+                connection = self._connections.get_nowait()
+            except queue.Empty:
+                return
+            connection.close()
+
+
+SERVER_ADDRESS = get_server_address()
+
+_pool = _ConnectionPool(SERVER_ADDRESS)
+atexit.register(_pool.clear)
+
+# RPC error code
+TIMEOUT_ERROR = 5000
+
 
-        buffer = []
-        buf_size = 2048
+class _HealthMonitor:
+    """ping server in background thread while request pending
 
+    Server marked not responding if ping timed out for several times, while
+    connection still accepted. Document feature request fail immediately
+    until server respond, ping interval increased while waiting.
+    Monitor stopped if server not running, or idle and server responding.
+    """
+
+    def __init__(self, interval=2, timeout=0.5, max_failure=3, max_interval=30):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_failure = max_failure
+        self.max_interval = max_interval
+
+        self.alive = True
+        self._ping_message = RPCMessage.request("ping").to_bytes()
+        # pending request count and thread, guarded by '_lock'
+        self._pending = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def begin_request(self):
+        with self._lock:
+            self._pending += 1
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def end_request(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _stop(self) -> bool:
+        """stop if idle and server responding, started again by next request"""
+        with self._lock:
+            if self.alive and not self._pending:
+                self._thread = None
+                return True
+            return False
+
+    def _ping(self):
+        # ping on pooled connection, server keep its handler for next request
+        while True:
+            connection, reused = _pool.acquire(self.timeout)
+            try:
+                connection.communicate(self._ping_message, self.timeout)
+            except OSError:
+                connection.close()
+                # pooled connection may be closed by server, retry with new one
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            else:
+                _pool.release(connection)
+                return
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            with self._lock:
+                # next thread may already be started after stopped
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _monitor(self):
+        failure = 0
+        interval = self.interval
         while True:
+            time.sleep(interval)
+            if self._stop():
+                return
+
             try:
-                msg = sock.recv(buf_size)
-            except socket.timeout:
-                return RPCMessage.response(
-                    RPCErrorMessage(code=5000, message="request timedout")
+                self._ping()
+            except (ConnectionRefusedError, FileNotFoundError):
+                # server not running, let request raise connection error
+                self.alive = True
+                return
+            except OSError:
+                # timed out, or connection backlog full
+                failure += 1
+            else:
+                failure = 0
+
+            alive = failure < self.max_failure
+            if self.alive and not alive:
+                LOGGER.debug("server not responding")
+                # pooled connection may wait for stale response
+                _pool.clear()
+            self.alive = alive
+            interval = self.interval if alive else min(interval * 2, self.max_interval)
+
+
+_monitor = _HealthMonitor()
+
+
+def _is_feature_request(message: Union[bytes, RPCMessage]) -> bool:
+    """document feature request, failed immediately if server not responding
+
+    Session request like 'shutdown' always sent, not responding server must
+    be able to shut down.
+    """
+    if not isinstance(message, RPCMessage):
+        return False
+    return str(message.get("method", "")).startswith("document_")
+
+
+def _request(
+    message: bytes,
+    count: int,
+    timeout,
+    cancel: Optional[socket.socket] = None,
+    fail_fast: bool = False,
+) -> List[RPCMessage]:
+
+    if fail_fast and not _monitor.alive:
+        return [
+            RPCMessage.response(
+                error=RPCErrorMessage(TIMEOUT_ERROR, message="server not responding")
+            )
+        ] * count
+
+    _monitor.begin_request()
+    try:
+        return _communicate(message, count, timeout, cancel)
+    finally:
+        _monitor.end_request()
+
+
+def _communicate(
+    message: bytes, count: int, timeout, cancel: Optional[socket.socket] = None
+) -> List[RPCMessage]:
+
+    while True:
+        connection, reused = _pool.acquire()
+        try:
+            responses = connection.communicate(message, timeout, count, cancel)
+
+        except socket.timeout:
+            # late response will corrupt next request, drop this connection
+            connection.close()
+            return [
+                RPCMessage.response(
+                    error=RPCErrorMessage(TIMEOUT_ERROR, message="request timedout")
                 )
+            ] * count
+
+        except OSError:
+            connection.close()
+            # pooled connection may be closed by server, retry with new one
+            if reused:
+                continue
+            raise
+
+        except Exception:
+            connection.close()
+            raise
+
+        else:
+            _pool.release(connection)
+            return responses
+
+
+def request(
+    message: Union[bytes, RPCMessage], *, timeout=60, cancel=None
+) -> RPCMessage:
+    """send request, return response
+
+    Waiting response cancelled if 'cancel' socket become readable.
+    """
+
+    fail_fast = _is_feature_request(message)
+    if isinstance(message, RPCMessage):
+        message = message.to_bytes()
+
+    return _request(message, 1, timeout, cancel, fail_fast)[0]
+
+
+def request_batch(
+    messages: List[Union[bytes, RPCMessage]], *, timeout=60, cancel=None
+) -> List[RPCMessage]:
+    """send all messages at once, return responses in same order"""
+
+    if not messages:
+        return []
+
+    data = b"".join(
+        message.to_bytes() if isinstance(message, RPCMessage) else message
+        for message in messages
+    )
+    fail_fast = all(_is_feature_request(message) for message in messages)
+    return _request(data, len(messages), timeout, cancel, fail_fast)
+
+
+def is_server_listening(timeout=0.1) -> bool:
+    """check if server accept connection"""
+    try:
+        create_connection(SERVER_ADDRESS, timeout=timeout).close()
+    except OSError:
+        return False
+    return True
+
+
+def request_sync(message: Union[bytes, RPCMessage], *, timeout=60) -> RPCMessage:
+    """send request and wait response in caller thread"""
+    return request(message, timeout=timeout)
+
+
+class _RequestWorker:
+    """send request in single background thread, response passed to callback
+
+    Request submitted with same key coalesced, only latest request sent.
+    Running request cancelled if newer request with same key submitted.
+    List of messages sent in single batch, callback receive list of responses.
+    Callback is called in worker thread.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._counter = itertools.count()
+        self._latest = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # key of running request, guarded by '_lock'
+        self._running = None
+        self._cancel_r, self._cancel_w = socket.socketpair()
+        self._cancel_r.setblocking(False)
+
+    def _start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def submit(
+        self,
+        message: Union[bytes, RPCMessage, List[RPCMessage]],
+        callback: Callable[[Any], None],
+        *,
+        key: Optional[str] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        timeout=60,
+    ):
+        seq = next(self._counter)
+        if key:
+            with self._lock:
+                self._latest[key] = seq
+                if self._running == key:
+                    self._cancel_w.send(b"x")
+        self._queue.put((seq, key, message, callback, on_error, timeout))
+        self._start()
+
+    def _drain_cancel(self):
+        try:
+            while self._cancel_r.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _run(self):
+        while True:
+            seq, key, message, callback, on_error, timeout = self._queue.get()
+
+            cancel = None
+            if key:
+                cancel = self._cancel_r
+                # newer request submitted after this check will cancel it
+                with self._lock:
+                    if self._latest.get(key) != seq:
+                        LOGGER.debug("drop stale request %s", key)
+                        continue
+                    self._running = key
+                    # drop cancel signal sent for previous request
+                    self._drain_cancel()
 
-            buffer.append(msg)
             try:
-                response = RPCMessage.from_bytes(b"".join(buffer))
-            except ContentIncomplete:
+                if isinstance(message, list):
+                    response = request_batch(message, timeout=timeout, cancel=cancel)
+                else:
+                    response = request(message, timeout=timeout, cancel=cancel)
+            except RequestCancelled:
+                LOGGER.debug("cancel stale request %s", key)
+                continue
+            except Exception as err:
+                if on_error:
+                    self._call(on_error, err)
+                else:
+                    LOGGER.debug("request error: %r", err)
                 continue
+            finally:
+                with self._lock:
+                    self._running = None
+
+            self._call(callback, response)
+
+    @staticmethod
+    def _call(func, *args):
+        try:
+            func(*args)
+        except Exception:
+            LOGGER.error("callback error", exc_info=True)
+
+
+_worker = _RequestWorker()
 
-            if len(msg) < buf_size:
-                break
 
-        return response
+def submit(
+    message: Union[bytes, RPCMessage, List[RPCMessage]],
+    callback: Callable[[Any], None],
+    *,
+    key: Optional[str] = None,
+    on_error: Optional[Callable[[Exception], None]] = None,
+    timeout=60,
+):
+    """send request in background, response passed to callback"""
+    _worker.submit(message, callback, key=key, on_error=on_error, timeout=timeout)
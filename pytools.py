@@ -1,27 +1,22 @@
 """pythools implementation"""
 
-import logging
 import re
 import os
 import subprocess
-from collections import defaultdict
-from functools import wraps
+from collections import OrderedDict, defaultdict
+from functools import lru_cache, partial
 from threading import Lock, Thread
-from typing import Iterable, Iterator, List, Any, Optional, Dict
+from typing import Iterable, List, Any, Optional, Dict, Tuple
 
 import sublime
 import sublime_plugin
 
+from .api import log
 from .api import environment
 from .api import client
 from .api import settings
 
-LOGGER = logging.getLogger(__name__)
-# LOGGER.setLevel(logging.DEBUG)
-STREAM_HANDLER = logging.StreamHandler()
-LOG_TEMPLATE = "%(levelname)s %(asctime)s %(filename)s:%(lineno)s  %(message)s"
-STREAM_HANDLER.setFormatter(logging.Formatter(LOG_TEMPLATE))
-LOGGER.addHandler(STREAM_HANDLER)
+LOGGER = log.get_logger(__name__)
 
 # features capability
 
@@ -41,12 +36,19 @@ def update_feature_capability():
     global DOCUMENT_FORMATTING
     global DOCUMENT_PUBLISH_DIAGNOSTIC
 
-    DOCUMENT_COMPLETION = settings.BASE_SETTING.get(settings.DOCUMENT_COMPLETION, True)
-    DOCUMENT_HOVER = settings.BASE_SETTING.get(settings.DOCUMENT_HOVER, True)
-    DOCUMENT_FORMATTING = settings.BASE_SETTING.get(settings.DOCUMENT_FORMATTING, True)
-    DOCUMENT_PUBLISH_DIAGNOSTIC = settings.BASE_SETTING.get(
-        settings.DOCUMENT_PUBLISH_DIAGNOSTIC, True
+    capability = settings.BASE_SETTING.get_many(
+        (
+            settings.DOCUMENT_COMPLETION,
+            settings.DOCUMENT_HOVER,
+            settings.DOCUMENT_FORMATTING,
+            settings.DOCUMENT_PUBLISH_DIAGNOSTIC,
+        ),
+        True,
     )
+    DOCUMENT_COMPLETION = capability[settings.DOCUMENT_COMPLETION]
+    DOCUMENT_HOVER = capability[settings.DOCUMENT_HOVER]
+    DOCUMENT_FORMATTING = capability[settings.DOCUMENT_FORMATTING]
+    DOCUMENT_PUBLISH_DIAGNOSTIC = capability[settings.DOCUMENT_PUBLISH_DIAGNOSTIC]
 
 
 def update_builtin_settings():
@@ -78,48 +80,11 @@ def plugin_loaded():
     )
 
 
-# prevent multiple request while in process
-PROCESS_LOCK = Lock()
-
-
-def pipe(func):
-    """pipe command, only one request"""
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        while PROCESS_LOCK.locked():
-            LOGGER.debug("busy")
-            return None
-
-        with PROCESS_LOCK:
-            status_key = "pytools_status"
-            view = sublime.active_window().active_view()
-            try:
-                view.set_status(status_key, "BUSY")
-                return func(*args, **kwargs)
-            finally:
-                view.erase_status(status_key)
-
-    return wrapper
-
-
 # prevent multiple process running server
+# held while server is starting
 RUN_SERVER_LOCK = Lock()
 
 
-def run_server_lock(func):
-    """running server guard"""
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        while RUN_SERVER_LOCK.locked():
-            return None
-        with RUN_SERVER_LOCK:
-            return func(*args, **kwargs)
-
-    return wrapper
-
-
 class PytoolsChangeInterpreterCommand(sublime_plugin.ApplicationCommand):
     """change python interpreter"""
 
@@ -149,7 +114,7 @@ class PytoolsChangeInterpreterCommand(sublime_plugin.ApplicationCommand):
             return
 
         settings.BASE_SETTING.set(settings.INTERPRETER, self.interpreters[index])
-        LOGGER.debug(f"selected: {self.interpreters[index]}")
+        LOGGER.debug("selected: %s", self.interpreters[index])
         sublime.run_command("pytools_shutdown_server")
 
 
@@ -164,49 +129,70 @@ class PytoolsRunServerCommand(sublime_plugin.ApplicationCommand):
             sublime.run_command("pytools_change_interpreter")
             return
 
-        self.view: sublime.View = sublime.active_window().active_view()
-        self.view.set_status("status_key", "RUNNING SERVER")
-
-        server = r"server\app.py"
+        server = os.path.join("server", "app.py")
         command = environment.get_python_exec_command(interpreter, server)
+        env = environment.get_python_exec_env(interpreter)
         workdir = os.path.dirname(__file__)
 
-        thread = Thread(target=self.run_server, args=(command, workdir))
-        thread.start()
+        # window may have no view
+        window = sublime.active_window()
+        self.view: Optional[sublime.View] = window.active_view() if window else None
+        thread = Thread(target=self.run_server, args=(command, workdir, env))
+
+        # released in run_server()
+        if not RUN_SERVER_LOCK.acquire(blocking=False):
+            LOGGER.debug("server already starting")
+            return
+
+        try:
+            if self.view:
+                self.view.set_status("status_key", "RUNNING SERVER")
+            thread.start()
+        except Exception:
+            RUN_SERVER_LOCK.release()
+            raise
 
-    def run_server(self, command, workdir):
+    def run_server(self, command, workdir, env):
         try:
-            client.run_server(command, workdir)
+            client.run_server(command, workdir, env)
         except client.AddressInUse as err:
-            LOGGER.debug(repr(err))
+            LOGGER.debug("%r", err)
         except Exception as err:
-            LOGGER.error(f"run_server error: {err}")
+            LOGGER.error("run_server error: %s", err)
         finally:
-            self.view.erase_status("status_key")
+            RUN_SERVER_LOCK.release()
+            if self.view:
+                self.view.erase_status("status_key")
             sublime.status_message("finish running server")
 
 
 SESSION = client.Session()
 
 
+def handle_request_error(err: Exception):
+    """handle background request error"""
+
+    if isinstance(err, ConnectionRefusedError):
+        LOGGER.debug("server not running")
+        sublime.run_command("pytools_run_server")
+    else:
+        LOGGER.debug("request error: %r", err)
+
+
 class PytoolsShutdownServerCommand(sublime_plugin.ApplicationCommand):
     """shutdown server"""
 
     def run(self):
         LOGGER.info("PytoolsShutdownServerCommand")
 
-        thread = Thread(target=self.shutdown)
-        thread.start()
+        SESSION.exit_async(on_error=self.on_error)
+        client.shutdown(callback=self.on_shutdown, on_error=self.on_error)
 
-    @pipe
-    def shutdown(self):
-        try:
-            SESSION.exit()
-            client.shutdown()
-        except Exception as err:
-            LOGGER.debug(f"shutdown error: {err}")
-        finally:
-            LOGGER.debug("server terminated")
+    def on_shutdown(self, response):
+        LOGGER.debug("server terminated")
+
+    def on_error(self, err: Exception):
+        LOGGER.debug("shutdown error: %s", err)
 
 
 def get_workspace_path(view: sublime.View):
@@ -216,16 +202,44 @@ def get_workspace_path(view: sublime.View):
     if not view or not file_name:
         return
     window: sublime.Window = view.window()
+    folders = tuple(window.folders()) if window else ()
+    return _get_workspace_path(file_name, folders)
+
+
+@lru_cache(maxsize=64)
+def _get_workspace_path(file_name: str, folders: Tuple[str, ...]):
     try:
-        path = max(
-            (folder for folder in window.folders() if file_name.startswith(folder))
-        )
+        path = max((folder for folder in folders if file_name.startswith(folder)))
     except Exception:
         return os.path.dirname(file_name)
     else:
         return path
 
 
+# source text by view id, reused while view not modified
+_SOURCE_CACHE: Dict[int, Tuple[int, str]] = {}
+
+
+def get_source(view: sublime.View, end: Optional[int] = None) -> str:
+    """get view source from beginning to 'end', or whole document"""
+
+    if end is None:
+        end = view.size()
+
+    change_count = view.change_count()
+    cached = _SOURCE_CACHE.get(view.id())
+    if cached and cached[0] == change_count and end <= len(cached[1]):
+        return cached[1][:end]
+
+    source = view.substr(sublime.Region(0, end))
+    _SOURCE_CACHE[view.id()] = (change_count, source)
+    return source
+
+
+def clear_source_cache(view: sublime.View):
+    _SOURCE_CACHE.pop(view.id(), None)
+
+
 ERROR_RESPONSE_PANEL_NAME = "error_response"
 
 
@@ -254,179 +268,66 @@ class PytoolsFormatDocumentCommand(sublime_plugin.TextCommand):
 
         LOGGER.info("PytoolsFormatDocumentCommand")
 
-        source = self.view.substr(sublime.Region(0, self.view.size()))
-        thread = Thread(target=self.format_document, args=(source,))
-        thread.start()
+        source = get_source(self.view)
+        self.format_document(source)
 
-    @pipe
     def format_document(self, source):
-        LOGGER.debug("formatting thread")
+        if not SESSION.active:
+            path = get_workspace_path(self.view)
+            SESSION.start_async(path)
 
-        try:
-            if not SESSION.active:
-                path = get_workspace_path(self.view)
-                SESSION.start(path)
-            formatted = client.document_formatting(source)
+        client.document_formatting(
+            source, callback=self.on_formatted, on_error=handle_request_error
+        )
 
-        except ConnectionRefusedError:
-            LOGGER.debug("server not running")
-            sublime.run_command("pytools_run_server")
+    def on_formatted(self, formatted):
+        result = formatted.get("result")
+        if result is not None:
+            hide_error_result(self.view.window())
+            self.view.run_command(
+                "pytools_apply_document_changes", {"changes": result["changes"]}
+            )
+            return
 
-        except Exception as err:
-            LOGGER.debug(f"formatting error: {repr(err)}")
+        LOGGER.debug(formatted["error"])
+        if formatted["error"]["code"] == client.NOT_INITIALIZED:
+            path = get_workspace_path(self.view)
+            SESSION.start_async(path)
         else:
-
-            result = formatted.get("result")
-            if result is not None:
-                hide_error_result(self.view.window())
-                self.view.run_command(
-                    "pytools_apply_document_changes", {"diff": result["diff"]}
-                )
-                return
-
-            LOGGER.debug(formatted["error"])
-            if formatted["error"]["code"] == client.NOT_INITIALIZED:
-                path = get_workspace_path(self.view)
-                SESSION.start(path)
-            else:
-                show_error_result(self.view.window(), formatted["error"]["message"])
+            show_error_result(self.view.window(), formatted["error"]["message"])
 
     def is_visible(self):
         return self.view.match_selector(0, "source.python")
 
 
-class DiffHunk:
-    """DiffHunk"""
-
-    header_pattern = re.compile(r"@@ \-(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
-
-    def __init__(self, start_remove, end_remove, start_insert, end_insert):
-        self.start_remove, self.end_remove = start_remove, end_remove
-        self.start_insert, self.end_insert = start_insert, end_insert
-        self._removed_text = []
-        self._insert_text = []
-
-    def __repr__(self):
-        return str(
-            {
-                "removed": {
-                    "start": self.start_remove,
-                    "end": self.end_remove,
-                    "text": self.removed_text,
-                },
-                "insert": {
-                    "start": self.start_insert,
-                    "end": self.end_insert,
-                    "text": self.insert_text,
-                },
-            }
-        )
-
-    def append_line(self, text: str):
-        if text.startswith(" "):
-            self._removed_text.append(text[1:])
-            self._insert_text.append(text[1:])
-        elif text.startswith("-+"):
-            self._insert_text.append(text[2:])
-        elif text.startswith("-"):
-            self._removed_text.append(text[1:])
-        elif text.startswith("+"):
-            self._insert_text.append(text[1:])
-
-    @property
-    def removed_text(self):
-        return "\n".join(self._removed_text)
-
-    @property
-    def insert_text(self):
-        return "\n".join(self._insert_text)
-
-    @classmethod
-    def from_header(cls, diff_header: str):
-        match = cls.header_pattern.match(diff_header)
-        if not match:
-            raise ValueError(f"unable parser diff_header from {diff_header}")
-
-        groups = match.groups()
-        remove_span = int(groups[1]) - 1 if groups[1] else 0
-        insert_span = int(groups[3]) - 1 if groups[3] else 0
-        start_remove = int(groups[0]) - 1  # editor use 0-based line index where diff 1
-        end_remove = start_remove + remove_span
-        start_insert = int(groups[2]) - 1  # editor use 0-based line index where diff 1
-        end_insert = start_insert + insert_span
-
-        return cls(start_remove, end_remove, start_insert, end_insert)
-
-
-class TextChange:
-    """text change item"""
-
-    def __init__(self, region: sublime.Region, new_text: str, cursor_move: int, /):
-        self.region = region
-        self.new_text = new_text
-        self.cursor_move = cursor_move
-
-    def __repr__(self):
-        return f"TextChange(region={self.region}, new_text={self.new_text}, cursor_move={self.cursor_move})"
-
-    def get_region(self, move=0):
-        return sublime.Region(self.region.begin() + move, self.region.end() + move)
-
-    @classmethod
-    def from_hunk(cls, view: sublime.View, hunk: DiffHunk, /):
-        region = sublime.Region(
-            a=view.line(view.text_point(hunk.start_remove, 0)).begin(),
-            b=view.line(view.text_point(hunk.end_remove, 0)).end(),
-        )
-        new_text = hunk.insert_text
-        cursor_move = len(new_text) - region.size()
-        return cls(region, new_text, cursor_move)
-
-
 class PytoolsApplyDocumentChangesCommand(sublime_plugin.TextCommand):
-    """apply document changes"""
-
-    def run(self, edit: sublime.Edit, diff: str):
-        LOGGER.info(f"apply changes for\n\n{diff}")
-
-        hunks = self.get_hunk(diff)
-        self.apply_change(edit, hunks)
+    """apply document changes
 
-    def get_hunk(self, diff: str) -> Iterator:
-        hunk = None
+    Each change replace lines from 'start' to 'end' (exclusive, 0-based)
+    with 'text'.
+    """
 
-        for line in diff.split("\n"):
-            if line.startswith("@@"):
-                if hunk:
-                    # yield current hunk
-                    yield hunk
-                hunk = DiffHunk.from_header(line)
+    def run(self, edit: sublime.Edit, changes: List[Dict[str, Any]]):
+        LOGGER.info("apply changes for\n\n%s", changes)
 
-            # continue if hunk not defined
-            if not hunk:
-                continue
-            # append
-            hunk.append_line(line)
-
-        if hunk:
-            yield hunk
-
-    def apply_change(self, edit: sublime.Edit, hunks: Iterable[DiffHunk]):
         view: sublime.View = self.view
-        text_changes = [TextChange.from_hunk(view, change) for change in hunks]
-        LOGGER.debug(text_changes)
+        last_row, _ = view.rowcol(view.size())
 
-        move = 0
-        for text_change in text_changes:
-            region = text_change.get_region(move)
-            view.erase(edit, region)
-            view.insert(edit, region.a, text_change.new_text)
-            move += text_change.cursor_move
+        def line_point(row: int) -> int:
+            return view.text_point(row, 0) if row <= last_row else view.size()
+
+        # apply from last change, region of previous change not moved
+        changes = sorted(changes, key=lambda change: change["start"], reverse=True)
+        for change in changes:
+            start, end = line_point(change["start"]), line_point(change["end"])
+            view.replace(edit, sublime.Region(start, end), change["text"])
 
 
 class DiagnosticItem:
     """Diagnostic item"""
 
+    __slots__ = ("severity", "row", "column", "message")
+
     def __init__(self, severity, row, column, message):
         self.severity = severity
         self.row = row
@@ -470,6 +371,9 @@ class Diagnostic:
         3: "pytools.info",
         4: "pytools.hint",
     }
+    region_flags = (
+        sublime.DRAW_NO_OUTLINE | sublime.DRAW_SQUIGGLY_UNDERLINE | sublime.DRAW_NO_FILL
+    )
 
     def __init__(self):
         self.diagnostics: Dict[str, DiagnosticItem] = {}
@@ -510,31 +414,21 @@ class Diagnostic:
         # clean region in view
         self.erase_regions(view)
 
-        err_region = [
-            item.get_region(view) for item in items if item.severity == "error"
-        ]
-        warn_region = [
-            item.get_region(view) for item in items if item.severity == "warning"
-        ]
-        info_region = [
-            item.get_region(view) for item in items if item.severity == "info"
-        ]
-        hint_region = [
-            item.get_region(view) for item in items if item.severity == "hint"
-        ]
-
-        for key_map, region in enumerate(
-            (hint_region, info_region, warn_region, err_region), start=1
-        ):
-            LOGGER.debug(f"add region '{self.region_keys[key_map]}' to {repr(region)}")
+        # group regions by severity in single pass
+        regions = {"error": [], "warning": [], "info": [], "hint": []}
+        for item in items:
+            if item.severity in regions:
+                regions[item.severity].append(item.get_region(view))
+
+        for key_map, severity in enumerate(("hint", "info", "warning", "error"), 1):
+            region = regions[severity]
+            LOGGER.debug("add region '%s' to %r", self.region_keys[key_map], region)
             view.add_regions(
                 key=self.region_keys[key_map],
                 regions=region,
                 scope="Invalid",
                 icon="circle",
-                flags=sublime.DRAW_NO_OUTLINE
-                | sublime.DRAW_SQUIGGLY_UNDERLINE
-                | sublime.DRAW_NO_FILL,
+                flags=self.region_flags,
             )
 
     def show_diagnostic_panel(self, view: sublime.View):
@@ -546,24 +440,23 @@ class Diagnostic:
 
         try:
             diagnostic_item: List[DiagnosticItem] = self.diagnostics[view.file_name()]
+            file_name = os.path.basename(view.file_name())
             panel.run_command(
                 "append",
                 {
                     "characters": "\n".join(
-                        [
-                            f"{os.path.basename(view.file_name())}:{item.row+1}:{item.column}: {item.message}"
-                            for item in diagnostic_item
-                        ]
+                        f"{file_name}:{item.row+1}:{item.column}: {item.message}"
+                        for item in diagnostic_item
                     )
                 },
             )
             window.run_command("show_panel", {"panel": f"output.{self.panel_name}"})
 
         except KeyError:
-            LOGGER.debug(f"no diagnostics report for {view.file_name()}")
+            LOGGER.debug("no diagnostics report for %s", view.file_name())
 
         except Exception as err:
-            LOGGER.debug(f"error show diagnostic for {view.file_name()}: {repr(err)}")
+            LOGGER.debug("error show diagnostic for %s: %r", view.file_name(), err)
 
     def hide_diagnostic_panel(self, view: sublime.View):
         window: sublime.Window = view.window()
@@ -596,38 +489,32 @@ class PytoolsPublishDiagnosticCommand(sublime_plugin.TextCommand):
         LOGGER.info("PytoolsPublishDiagnosticCommand")
 
         file_name = self.view.file_name()
+        self.publish_diagnostic(file_name)
 
-        thread = Thread(target=self.publish_diagnostic, args=(file_name,))
-        thread.start()
-
-    @pipe
     def publish_diagnostic(self, file_name):
-        LOGGER.debug("publish_diagnostic thread")
-        try:
-            if not SESSION.active:
-                path = get_workspace_path(self.view)
-                SESSION.start(path)
-            source = self.view.substr(sublime.Region(0, self.view.size()))
-            diagnostics = client.document_publish_diagnostic(
-                source=source, path=file_name
-            )
-
-        except ConnectionRefusedError:
-            LOGGER.debug("server not running")
-            sublime.run_command("pytools_run_server")
+        if not SESSION.active:
+            path = get_workspace_path(self.view)
+            SESSION.start_async(path)
+
+        source = get_source(self.view)
+        client.document_publish_diagnostic(
+            source=source,
+            path=file_name,
+            callback=self.on_diagnostic,
+            on_error=handle_request_error,
+        )
 
-        except Exception as err:
-            LOGGER.debug(f"publish diagnostic error: {repr(err)}")
-        else:
-            result = diagnostics.get("result")
-            if result is not None:
-                DIAGNOSTIC.add_diagnostic(self.view, result)
-                return
+    def on_diagnostic(self, diagnostics):
+        result = diagnostics.get("result")
+        if result is not None:
+            # response handled in worker thread, update view in main thread
+            sublime.set_timeout(lambda: DIAGNOSTIC.add_diagnostic(self.view, result), 0)
+            return
 
-            LOGGER.debug(diagnostics["error"])
-            if diagnostics["error"]["code"] == client.NOT_INITIALIZED:
-                path = get_workspace_path(self.view)
-                SESSION.start(path)
+        LOGGER.debug(diagnostics["error"])
+        if diagnostics["error"]["code"] == client.NOT_INITIALIZED:
+            path = get_workspace_path(self.view)
+            SESSION.start_async(path)
 
     def is_visible(self):
         return self.view.match_selector(0, "source.python")
@@ -649,7 +536,7 @@ class CompletionParam:
     def __init__(self, view: sublime.View):
         # complete on first cursor
         self.location = self.get_completion_point(view)
-        self.source = view.substr(sublime.Region(0, self.location))
+        self.source = get_source(view, self.location)
 
     def get_completion_point(self, view: sublime.View) -> int:
         """get competion point"""
@@ -718,11 +605,43 @@ class CompletionItem(sublime.CompletionItem):
 
     @classmethod
     def from_rpc(cls, rpc_data):
-        return cls(
-            trigger=rpc_data["label"],
-            annotation=rpc_data["annotation"],
-            kind=cls.kind_map[rpc_data["type"]],
-        )
+        return cls._build(rpc_data["label"], rpc_data["annotation"], rpc_data["type"])
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def _build(cls, label: str, annotation: str, type_: str):
+        # same candidates returned on every keystroke in same scope
+        return cls(trigger=label, annotation=annotation, kind=cls.kind_map[type_])
+
+
+class CompletionCache:
+    """completion items by source and location, least recently used discarded"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(param: CompletionParam):
+        # key on content, same source may be requested again after undo
+        return (param.location, param.source)
+
+    def get(self, param: CompletionParam) -> Optional[List[CompletionItem]]:
+        key = self._key(param)
+        with self._lock:
+            items = self._items.get(key)
+            if items is not None:
+                self._items.move_to_end(key)
+            return items
+
+    def set(self, param: CompletionParam, items: List[CompletionItem]):
+        key = self._key(param)
+        with self._lock:
+            self._items[key] = items
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
 
 
 def is_python_code(view: sublime.View):
@@ -730,19 +649,16 @@ def is_python_code(view: sublime.View):
     return view.match_selector(0, "source.python")
 
 
+# f-string interpolation, or source outside string and comment
+IDENTIFIER_SELECTOR = (
+    "(meta.string.interpolated.python meta.interpolation.python)"
+    " | (source - meta.string - comment)"
+)
+
+
 def is_identifier(view: sublime.View, point: int):
     """point in View is identifier"""
-
-    # f-string
-    if view.match_selector(
-        point, "meta.string.interpolated.python meta.interpolation.python"
-    ):
-        return True
-    if view.match_selector(point, "meta.string"):
-        return False
-    if view.match_selector(point, "comment"):
-        return False
-    return True
+    return view.match_selector(point, IDENTIFIER_SELECTOR)
 
 
 POPUP_STYLE = """
@@ -761,15 +677,11 @@ code {
 
 class EventListener(sublime_plugin.EventListener):
     def __init__(self):
-        self._prev_param = None
-        self.completion = None
+        self.completion_cache = CompletionCache()
 
     @staticmethod
     def _change_workspace(path):
-        try:
-            client.change_workspace(path)
-        except ConnectionError as err:
-            LOGGER.debug(err)
+        SESSION.change_workspace(path, on_error=LOGGER.debug)
 
     def on_activated(self, view: sublime.View):
         """on view activated"""
@@ -779,8 +691,10 @@ class EventListener(sublime_plugin.EventListener):
 
         if SESSION.active:
             path = get_workspace_path(view)
-            thread = Thread(target=self._change_workspace, args=(path,))
-            thread.start()
+            self._change_workspace(path)
+
+    def on_close(self, view: sublime.View):
+        clear_source_cache(view)
 
     def on_post_save(self, view: sublime.View):
         if not is_python_code(view):
@@ -788,19 +702,16 @@ class EventListener(sublime_plugin.EventListener):
 
         if SESSION.active:
             path = get_workspace_path(view)
-            thread = Thread(target=self._change_workspace, args=(path,))
-            thread.start()
+            self._change_workspace(path)
 
     def on_query_completions(
         self, view: sublime.View, prefix: Any, locations: Any
     ) -> Optional[Iterable[Any]]:
 
-        if not all(
-            [
-                is_python_code(view),
-                is_identifier(view, locations[0]),
-                DOCUMENT_COMPLETION,
-            ]
+        if not (
+            DOCUMENT_COMPLETION
+            and is_python_code(view)
+            and is_identifier(view, locations[0])
         ):
             return None
 
@@ -810,61 +721,56 @@ class EventListener(sublime_plugin.EventListener):
             view.run_command("hide_auto_complete")
             return None
 
-        if self.completion and self._prev_param:
-            if (
-                self._prev_param.location == param.location
-                and self._prev_param.source == param.source
-            ):
-                return sublime.CompletionList(
-                    self.completion, sublime.INHIBIT_WORD_COMPLETIONS
-                )
+        completion = self.completion_cache.get(param)
+        if completion is not None:
+            return sublime.CompletionList(completion, sublime.INHIBIT_WORD_COMPLETIONS)
 
-        thread = Thread(target=self.document_completion, args=(view, param))
-        thread.start()
+        self.document_completion(view, param)
         view.run_command("hide_auto_complete")
         return None
 
-    @pipe
     def document_completion(self, view: sublime.View, param: CompletionParam):
-        try:
+        """request completion in background, stale request discarded"""
+
+        row, col = view.rowcol(param.location)
+        row += 1
+
+        # initialize session and request completion in single round trip
+        with SESSION.batch(on_error=handle_request_error) as batch:
             if not SESSION.active:
                 path = get_workspace_path(view)
-                SESSION.start(path)
-            source = param.source
-            row, col = view.rowcol(param.location)
-            row += 1
-            completions = client.document_completion(source, row, col)
-
-        except ConnectionRefusedError:
-            LOGGER.debug("server not running")
-            sublime.run_command("pytools_run_server")
+                SESSION.start_async(path, batch=batch)
+
+            client.document_completion(
+                param.source,
+                row,
+                col,
+                callback=partial(self._on_completion, view, param),
+                batch=batch,
+            )
 
-        except ConnectionError as err:
-            LOGGER.debug(err)
+    def _on_completion(self, view: sublime.View, param: CompletionParam, completions):
+        result = completions.get("result")
+        if result is not None:
+            items = [CompletionItem.from_rpc(item) for item in result]
+            LOGGER.debug("candidates = %d", len(items))
+            self.completion_cache.set(param, items)
 
-        else:
-            result = completions.get("result")
-            if result is not None:
-                items = [CompletionItem.from_rpc(item) for item in result]
-                LOGGER.debug(f"candidates = {len(items)}")
-                self._prev_param = param
-                self.completion = items
-
-                view.run_command("hide_auto_complete")
-                view.run_command(
-                    "auto_complete",
-                    {
-                        "disable_auto_insert": True,
-                        "next_completion_if_showing": False,
-                        "auto_complete_commit_on_tab": True,
-                    },
-                )
-                return
+            view.run_command("hide_auto_complete")
+            view.run_command(
+                "auto_complete",
+                {
+                    "disable_auto_insert": True,
+                    "next_completion_if_showing": False,
+                    "auto_complete_commit_on_tab": True,
+                },
+            )
+            return
 
-            LOGGER.debug(completions["error"])
-            if completions["error"]["code"] == client.NOT_INITIALIZED:
-                path = get_workspace_path(view)
-                SESSION.start(path)
+        LOGGER.debug(completions["error"])
+        if completions["error"]["code"] == client.NOT_INITIALIZED:
+            path = get_workspace_path(view)
+            SESSION.start_async(path)
 
     def on_hover(self, view: sublime.View, point: int, hover_zone: int):
         """on hover"""
@@ -873,69 +779,65 @@ class EventListener(sublime_plugin.EventListener):
             return
 
         if hover_zone == sublime.HOVER_TEXT:
-            if not all([is_identifier(view, point), DOCUMENT_HOVER]):
+            if not (DOCUMENT_HOVER and is_identifier(view, point)):
                 return
 
             LOGGER.info("on HOVER_TEXT")
 
-            thread = Thread(target=self.on_hover_text, args=(view, point))
-            thread.start()
+            self.on_hover_text(view, point)
 
-    @pipe
     def on_hover_text(self, view: sublime.View, point: int):
-        try:
-            if not SESSION.active:
-                path = get_workspace_path(view)
-                SESSION.start(path)
+        """request documentation in background, stale request discarded"""
 
-            # point to word endpoint
-            word = view.word(point)
-            end_point = word.b
-
-            source = view.substr(sublime.Region(0, end_point))
-            row, col = view.rowcol(end_point)
-            row += 1
-            documentation = client.document_hover(source, row, col)
+        if not SESSION.active:
+            path = get_workspace_path(view)
+            SESSION.start_async(path)
+
+        # point to word endpoint
+        word = view.word(point)
+        end_point = word.b
+
+        source = get_source(view, end_point)
+        row, col = view.rowcol(end_point)
+        row += 1
+        client.document_hover(
+            source,
+            row,
+            col,
+            callback=partial(self._on_hover, view, point),
+            on_error=handle_request_error,
+        )
 
-        except ConnectionRefusedError:
-            LOGGER.debug("server not running")
-            sublime.run_command("pytools_run_server")
+    def _on_hover(self, view: sublime.View, point: int, documentation):
+        result = documentation.get("result")
+        if result is not None:
+            content = result["content"]
+            LOGGER.debug("result : %s", content)
 
-        except ConnectionError as err:
-            LOGGER.debug(err)
+            def on_navigate(link):
+                if link.startswith(":"):
+                    file_name = view.file_name()
+                    link = "".join([file_name, link])
+                view.window().open_file(link, flags=sublime.ENCODED_POSITION)
 
-        else:
-            result = documentation.get("result")
-            if result is not None:
-                content = result["content"]
-                LOGGER.debug(f"result : {content}")
-
-                def on_navigate(link):
-                    if link.startswith(":"):
-                        file_name = view.file_name()
-                        link = "".join([file_name, link])
-                    view.window().open_file(link, flags=sublime.ENCODED_POSITION)
-
-                try:
-                    content = (
-                        f"<style>{POPUP_STYLE}</style>\n{content}" if content else ""
-                    )
-                    view.show_popup(
-                        content,
-                        flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY,
-                        location=point,
-                        max_width=1024,
-                        on_navigate=on_navigate,
-                    )
-                except Exception as err:
-                    LOGGER.debug(err)
+            try:
+                content = f"<style>{POPUP_STYLE}</style>\n{content}" if content else ""
+                view.show_popup(
+                    content,
+                    flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY,
+                    location=point,
+                    max_width=1024,
+                    on_navigate=on_navigate,
+                )
+            except Exception as err:
+                LOGGER.debug(err)
 
-                return
+            return
 
-            LOGGER.debug(documentation["error"])
-            if documentation["error"]["code"] == client.NOT_INITIALIZED:
-                path = get_workspace_path(view)
-                SESSION.start(path)
+        LOGGER.debug(documentation["error"])
+        if documentation["error"]["code"] == client.NOT_INITIALIZED:
+            path = get_workspace_path(view)
+            SESSION.start_async(path)
 
 
 class PytoolsOpenTerminalCommand(sublime_plugin.TextCommand):
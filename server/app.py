@@ -1,14 +1,22 @@
 """main app module"""
 
+import errno
 import json
 import logging
 import os
 import re
 import signal
+import socketserver
+import stat
 import sys
-from socket import socket
-from socketserver import TCPServer, BaseServer
-from typing import Tuple, Any
+import tempfile
+import threading
+from collections import OrderedDict
+from importlib import import_module
+from importlib.util import find_spec
+from socket import socket, AF_INET, IPPROTO_TCP, TCP_NODELAY
+from socketserver import ThreadingTCPServer, BaseServer
+from typing import Tuple
 
 LOGGER = logging.getLogger(__name__)
 # LOGGER.setLevel(logging.DEBUG)
@@ -21,6 +29,29 @@ FILE_HANDLER.setLevel(logging.ERROR)
 FILE_HANDLER.setFormatter(logging.Formatter(LOG_TEMPLATE))
 LOGGER.addHandler(FILE_HANDLER)
 
+# use faster json library if available
+try:
+    import orjson
+
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+
+except ImportError:
+    try:
+        import ujson as _json
+
+        def json_dumps(obj) -> bytes:
+            return _json.dumps(obj).encode()
+
+    except ImportError:
+        _json = json
+
+        def json_dumps(obj) -> bytes:
+            # compact separator, smaller payload
+            return _json.dumps(obj, separators=(",", ":")).encode()
+
+    json_loads = _json.loads
+
 # EXIT CODE
 EXIT_SUCCESS = 0
 EXIT_ERROR = 1
@@ -34,24 +65,29 @@ PARAM_ERROR = 5005
 NOT_INITIALIZED = 5006
 
 # Feature capability
-DOCUMENT_COMPLETION = True
-DOCUMENT_HOVER = True
-DOCUMENT_FORMATTING = True
-DOCUMENT_PUBLISH_DIAGNOSTIC = True
-
-try:
-    import jedi_service
-except ImportError:
-    DOCUMENT_COMPLETION = False
-    DOCUMENT_HOVER = False
-try:
-    import black_service
-except ImportError:
-    DOCUMENT_FORMATTING = False
-try:
-    import pyflakes_service
-except ImportError:
-    DOCUMENT_PUBLISH_DIAGNOSTIC = False
+# services imported on first use, importing jedi and black is slow and delay
+# server ready to accept connection
+DOCUMENT_COMPLETION = find_spec("jedi") is not None
+DOCUMENT_HOVER = DOCUMENT_COMPLETION
+DOCUMENT_FORMATTING = find_spec("black") is not None
+DOCUMENT_PUBLISH_DIAGNOSTIC = find_spec("pyflakes") is not None
+
+
+def preload_services():
+    """import available services in background, before first request"""
+
+    services = (
+        ("jedi_service", DOCUMENT_COMPLETION or DOCUMENT_HOVER),
+        ("black_service", DOCUMENT_FORMATTING),
+        ("pyflakes_service", DOCUMENT_PUBLISH_DIAGNOSTIC),
+    )
+    for name, available in services:
+        if not available:
+            continue
+        try:
+            import_module(name)
+        except Exception:
+            LOGGER.error("error importing %s", name, exc_info=True)
 
 
 class ContentIncomplete(ValueError):
@@ -65,51 +101,58 @@ class ContentOverflow(ValueError):
 class RPCErrorMessage(dict):
     """RPCErrorMessage"""
 
+    __slots__ = ()
+
     def __init__(self, code: int, message: str = "", **kwargs):
-        super().__init__({"code": code, "message": message})
-        self.update(kwargs)
+        super().__init__(code=code, message=message, **kwargs)
+
+
+# prebuilt header for common small message size
+_HEADERS = [b"Content-Length: %d\r\n\r\n" % size for size in range(4096)]
 
 
 class RPCMessage(dict):
     """RPCMessage"""
 
+    __slots__ = ()
+
     def to_bytes(self):
-        content = json.dumps(self)
-        content_encoded = content.encode()
-        header = f"Content-Length: {len(content_encoded)}"
-        return b"%s\r\n\r\n%s" % (header.encode("ascii"), content_encoded)
+        content = json_dumps(self)
+        size = len(content)
+        if size < len(_HEADERS):
+            return _HEADERS[size] + content
+        return b"Content-Length: %d\r\n\r\n" % size + content
 
     @classmethod
     def request(cls, method, params=None):
         if params is None:
             params = {}
-        return cls({"method": method, "params": params})
+        return cls(method=method, params=params)
 
     @classmethod
     def response(cls, result=None, error=None):
         if error:
-            return cls({"error": error})
-        return cls({"result": result})
+            return cls(error=error)
+        return cls(result=result)
 
-    _content_length_pattern = re.compile(r"Content-Length: (\d+)")
+    _content_length_pattern = re.compile(rb"Content-Length:\s*(\d+)")
 
     @staticmethod
-    def get_content_length(header):
-        for line in header.splitlines():
-            match = RPCMessage._content_length_pattern.match(line)
-            if match:
-                return int(match.group(1))
+    def get_content_length(header: bytes) -> int:
+        match = RPCMessage._content_length_pattern.search(header)
+        if match:
+            return int(match.group(1))
         raise ValueError("unable get 'Content-Length'")
 
     @classmethod
     def from_bytes(cls, b: bytes, /):
-        try:
-            header, content = b.split(b"\r\n\r\n")
-        except Exception as err:
-            raise ValueError("unable get header") from err
-        content_length = cls.get_content_length(header.decode("ascii"))
+        header_end = b.find(b"\r\n\r\n")
+        if header_end < 0:
+            raise ValueError("unable get header")
+        content_length = cls.get_content_length(b[:header_end])
 
-        expected_length = len(content)
+        content_start = header_end + 4
+        expected_length = len(b) - content_start
         if expected_length < content_length:
             raise ContentIncomplete(
                 f"want {content_length}, expected {expected_length}"
@@ -117,8 +160,12 @@ class RPCMessage(dict):
         elif expected_length > content_length:
             raise ContentOverflow(f"want {content_length}, expected {expected_length}")
 
+        return cls.from_content(b[content_start:])
+
+    @classmethod
+    def from_content(cls, content: bytes, /):
         try:
-            message = json.loads(content.decode())
+            message = json_loads(content)
         except Exception as err:
             LOGGER.debug(content)
             raise ValueError("error parsing message") from err
@@ -133,14 +180,74 @@ class InvalidParams(ValueError):
     """Params invalid"""
 
 
+class MethodNotFound(ValueError):
+    """Method not found"""
+
+
 class NotInitialized(ValueError):
     """Project not initialized"""
 
 
+class _ThreadingTCPServer(ThreadingTCPServer):
+    # client keep connection alive, don't wait client thread on exit
+    daemon_threads = True
+    # server close connection first on shutdown, leave socket in TIME_WAIT.
+    # On Windows SO_REUSEADDR allow multiple server bind to same address.
+    allow_reuse_address = os.name != "nt"
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+
+    class _ThreadingUnixStreamServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+def get_server_address():
+    """unix socket path on POSIX, or TCP loopback address
+
+    Unix socket path may be defined in 'PYTOOLS_SOCKET' environment variable.
+    """
+
+    if os.name != "nt" and hasattr(socketserver, "ThreadingUnixStreamServer"):
+        return os.environ.get("PYTOOLS_SOCKET") or os.path.join(
+            tempfile.gettempdir(), "pytools-9005.sock"
+        )
+    return ("localhost", 9005)
+
+
+def remove_stale_socket(path: str):
+    """remove unix socket file left by terminated server"""
+
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+
+    # never remove other file defined as server address
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EEXIST, f"server address is not a socket: {path!r}")
+
+    with socket(_ThreadingUnixStreamServer.address_family) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            os.remove(path)
+        else:
+            raise OSError(errno.EADDRINUSE, "socket address in use")
+
+
 class Server:
     def __init__(self, server_address):
         self.server_address = server_address
-        self.tcp_server = TCPServer(server_address, self.request_handler)
+        if isinstance(server_address, str):
+            remove_stale_socket(server_address)
+            self.tcp_server = _ThreadingUnixStreamServer(
+                server_address, self.request_handler
+            )
+        else:
+            self.tcp_server = _ThreadingTCPServer(server_address, self.request_handler)
+        # services are not thread safe, handle one request at a time
+        self._request_lock = threading.Lock()
 
         self._terminate = False
 
@@ -168,14 +275,34 @@ class Server:
         }
         self.project_settings = {}
 
-        self.jedi_svc = jedi_service.Service()
+        self._jedi_svc = None
+        # hover result by source and position, mouse often stay on same symbol
+        self._hover_cache = OrderedDict()
+        self._hover_cache_size = 128
+        # diagnostic result by path and source, same document often rechecked
+        self._diagnostic_cache = OrderedDict()
+        self._diagnostic_cache_size = 64
+
+    @property
+    def jedi_svc(self):
+        if self._jedi_svc is None:
+            import jedi_service
+
+            workspace = self.project_settings.get("workspace")
+            self._jedi_svc = jedi_service.Service(project_path=workspace)
+        return self._jedi_svc
 
     def serve_forever(self):
         self.tcp_server.serve_forever()
 
-    def ping(self, params) -> Any:
+    def close(self):
+        self.tcp_server.server_close()
+        if isinstance(self.server_address, str):
+            os.remove(self.server_address)
+
+    def ping(self, params) -> RPCMessage:
         LOGGER.info("ping")
-        return params
+        return RPCMessage.response(result=params)
 
     def shutdown(self, params) -> RPCMessage:
         """shutdown server"""
@@ -193,7 +320,8 @@ class Server:
             workspace_path = ""
 
         self.project_settings["workspace"] = workspace_path
-        LOGGER.debug(f"server capability : {self.server_capability}")
+        self._hover_cache.clear()
+        LOGGER.debug("server capability : %s", self.server_capability)
         return RPCMessage.response(result=self.server_capability)
 
     def change_workspace(self, params) -> RPCMessage:
@@ -214,7 +342,9 @@ class Server:
             )
         else:
             self.project_settings["workspace"] = path
-            self.jedi_svc.change_workspace(path)
+            if self._jedi_svc is not None:
+                self._jedi_svc.change_workspace(path)
+            self._hover_cache.clear()
             LOGGER.debug(self.project_settings["workspace"])
             return RPCMessage.response()
 
@@ -222,6 +352,7 @@ class Server:
         """exit project"""
         LOGGER.info("exit")
         self.project_settings = {}
+        self._hover_cache.clear()
 
         return RPCMessage.response()
 
@@ -239,6 +370,8 @@ class Server:
         except Exception as err:
             raise InvalidParams(f"error: {err}")
 
+        import jedi_service
+
         try:
             candidates = self.jedi_svc.complete(source, row, column)
             result = jedi_service.completion_to_rpc(candidates)
@@ -263,6 +396,14 @@ class Server:
         except Exception as err:
             raise InvalidParams(f"error: {err}") from err
 
+        # key on source itself, equal hash doesn't mean equal source
+        key = (source, row, column)
+        if key in self._hover_cache:
+            self._hover_cache.move_to_end(key)
+            return RPCMessage.response(result=self._hover_cache[key])
+
+        import jedi_service
+
         try:
             candidates = self.jedi_svc.hover(source, row, column)
             result = jedi_service.documentation_to_rpc(candidates)
@@ -271,6 +412,9 @@ class Server:
                 error=RPCErrorMessage(code=INPUT_ERROR, message=repr(err))
             )
         else:
+            self._hover_cache[key] = result
+            if len(self._hover_cache) > self._hover_cache_size:
+                self._hover_cache.popitem(last=False)
             return RPCMessage.response(result=result)
 
     def document_formatting(self, params) -> RPCMessage:
@@ -285,6 +429,8 @@ class Server:
         except Exception as err:
             raise InvalidParams(f"error: {err}") from err
 
+        import black_service
+
         try:
             formatted = black_service.format_code(source)
             result = black_service.changes_to_rpc(source, formatted)
@@ -313,14 +459,24 @@ class Server:
                 with open(path) as file:
                     source = file.read()
 
-            messages = pyflakes_service.publish_diagnostic(source, path)
-            result = pyflakes_service.diagnostic_to_rpc(messages)
+            key = (path, source)
+            if key in self._diagnostic_cache:
+                self._diagnostic_cache.move_to_end(key)
+                return RPCMessage.response(result=self._diagnostic_cache[key])
+
+            import pyflakes_service
+
+            report = pyflakes_service.publish_diagnostic(source, path)
+            result = pyflakes_service.diagnostic_to_rpc(report)
 
         except Exception as err:
             return RPCMessage.response(
                 error=RPCErrorMessage(code=INTERNAL_ERROR, message=repr(err))
             )
         else:
+            self._diagnostic_cache[key] = result
+            if len(self._diagnostic_cache) > self._diagnostic_cache_size:
+                self._diagnostic_cache.popitem(last=False)
             return RPCMessage.response(result=result)
 
     def document_rename(self, params) -> RPCMessage:
@@ -336,8 +492,11 @@ class Server:
 
         try:
             func = self.service_map[method]
-        except KeyError as err:
-            raise Exception(f"method not found {err}") from err
+        except (KeyError, TypeError) as err:
+            raise MethodNotFound(f"method not found {method!r}") from err
+
+        if not isinstance(params, dict):
+            raise InvalidParams(f"invalid params type {type(params).__name__!r}")
 
         return func(params)
 
@@ -346,23 +505,24 @@ class Server:
     ):
         """socket server request handler"""
 
-        buffer = []
-        buf_size = 2048
-
         def send_response(message):
             LOGGER.debug(message)
             if isinstance(message, RPCMessage):
                 message = message.to_bytes()
             request.sendall(message)
 
-        while True:
-            buf = request.recv(buf_size)
-            buffer.append(buf)
+        # send small response immediately, don't wait for Nagle buffering
+        if request.family == AF_INET:
+            request.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
 
+        # connection is kept alive by client, serve until closed
+        buffer = bytearray()
+        chunk = memoryview(bytearray(65536))
+        while True:
             try:
-                message = RPCMessage.from_bytes(b"".join(buffer))
-            except ContentIncomplete:
-                continue
+                message = self.recv_message(request, buffer, chunk)
+            except ConnectionError:
+                return
             except Exception as err:
                 LOGGER.error("parsing error", exc_info=True)
                 send_response(
@@ -372,10 +532,67 @@ class Server:
                 )
                 return
 
-            if len(buf) < buf_size:
-                break
+            if message is None:
+                return
+
+            # ping check server responding, not wait for running request
+            if message.get("method") == "ping":
+                response = self.process_message(message)
+            else:
+                with self._request_lock:
+                    response = self.process_message(message)
+            try:
+                send_response(response)
+            except ConnectionError:
+                # client closed connection, e.g. request timed out
+                return
+
+            if self._terminate:
+                # shutdown() must be called from other than serve_forever() thread
+                threading.Thread(target=self.tcp_server.shutdown).start()
+                return
+
+    def recv_message(self, request: socket, buffer: bytearray, chunk: memoryview):
+        """receive single message, return None if connection closed
+
+        Client may send multiple messages at once, received data of next
+        message is kept in buffer. Data received into reusable 'chunk'.
+        """
+
+        separator = b"\r\n\r\n"
+
+        # header parsed once, then read until content complete
+        scan_start = 0
+        message_end = -1
+
+        while True:
+            if message_end < 0:
+                header_end = buffer.find(separator, scan_start)
+                if header_end > -1:
+                    content_length = RPCMessage.get_content_length(buffer[:header_end])
+                    content_start = header_end + len(separator)
+                    message_end = content_start + content_length
+                else:
+                    # separator may be split between previous and next chunk
+                    scan_start = max(len(buffer) - len(separator) + 1, 0)
+
+            if -1 < message_end <= len(buffer):
+                with memoryview(buffer) as view:
+                    content = bytes(view[content_start:message_end])
+                del buffer[:message_end]
+                return RPCMessage.from_content(content)
+
+            size = request.recv_into(chunk)
+            if not size:
+                if buffer:
+                    raise ConnectionResetError("connection closed by client")
+                return None
+
+            buffer += chunk[:size]
+
+    def process_message(self, message: RPCMessage) -> RPCMessage:
+        """process message, return response message"""
 
-        response = RPCMessage()
         try:
             result = self.handle_request(message)
         except InvalidRequest as err:
@@ -384,6 +601,11 @@ class Server:
         except InvalidParams as err:
             LOGGER.error("params error", exc_info=True)
             response = RPCMessage.response(error=RPCErrorMessage(PARAM_ERROR, str(err)))
+        except MethodNotFound as err:
+            LOGGER.error("method error: %s", err)
+            response = RPCMessage.response(
+                error=RPCErrorMessage(METHOD_ERROR, str(err))
+            )
         except NotInitialized as err:
             response = RPCMessage.response(
                 error=RPCErrorMessage(NOT_INITIALIZED, str(err))
@@ -401,15 +623,11 @@ class Server:
             else:
                 response = result
 
-        finally:
-            send_response(response)
-
-        if self._terminate:
-            sys.exit(EXIT_SUCCESS)
+        return response
 
 
 def terminate(*args):
-    LOGGER.debug(f"terminate {args}")
+    LOGGER.debug("terminate %s", args)
     sys.exit(EXIT_SUCCESS)
 
 
@@ -418,9 +636,13 @@ def main():
         signal.signal(signal.SIGTERM, terminate)
 
         try:
-            server = Server(("localhost", 9005))
+            server = Server(get_server_address())
             print(f"running server server at {server.server_address}")
-            server.serve_forever()
+            threading.Thread(target=preload_services, daemon=True).start()
+            try:
+                server.serve_forever()
+            finally:
+                server.close()
 
         except OSError as err:
             print(f"os error: {err}")
@@ -431,7 +653,7 @@ def main():
         pass
 
     except Exception as err:
-        LOGGER.error(f"application error {err}", exc_info=True)
+        LOGGER.error("application error %s", err, exc_info=True)
         sys.exit(EXIT_ERROR)
 
 
@@ -1,8 +1,10 @@
 """handle document formatting with black"""
 
 import logging
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
 
-from black import FileMode, format_str, DEFAULT_LINE_LENGTH, diff
+from black import FileMode, format_str, DEFAULT_LINE_LENGTH
 from black import NothingChanged, InvalidInput
 
 LOGGER = logging.getLogger(__name__)
@@ -23,12 +25,73 @@ def format_code(code: str, **kwargs):
     try:
         formatted = format_str(code, mode=mode)
     except NothingChanged as err:
-        LOGGER.debug(repr(err))
-        return ""
+        LOGGER.debug("%r", err)
+        # unchanged source take the equality shortcut in changes_to_rpc
+        return code
     else:
         LOGGER.debug("formatted: %s\n", formatted)
         return formatted
 
 
-def changes_to_rpc(old, new):
-    return {"diff": diff(old, new, "Original", "Formatted")}
+def split_lines(text: str) -> List[str]:
+    """split text at newline, line ending kept"""
+
+    lines = [line + "\n" for line in text.split("\n")]
+    # last line has no line ending
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def changes_to_rpc(old: str, new: str) -> Dict[str, Any]:
+    """build text changes, each replace old lines 'start' to 'end' with 'text'"""
+
+    # already formatted document is common, skip diff
+    if old == new:
+        return {"changes": []}
+
+    old_lines = split_lines(old)
+    new_lines = split_lines(new)
+
+    # only diff lines between common head and tail
+    head = 0
+    max_head = min(len(old_lines), len(new_lines))
+    while head < max_head and old_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    max_tail = max_head - head
+    while tail < max_tail and old_lines[-1 - tail] == new_lines[-1 - tail]:
+        tail += 1
+
+    old_end = len(old_lines) - tail
+    new_end = len(new_lines) - tail
+
+    # at most one line left on either side always yield single merged change
+    if min(old_end, new_end) - head <= 1:
+        text = "".join(new_lines[head:new_end])
+        return {"changes": [{"start": head, "end": old_end, "text": text}]}
+
+    matcher = SequenceMatcher(
+        None, old_lines[head:old_end], new_lines[head:new_end], autojunk=False
+    )
+
+    # changed line ranges [old_start, old_end, new_start, new_end], change
+    # separated by single unchanged line merged to reduce applied edits
+    ranges = []
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        old_start, old_end = old_start + head, old_end + head
+        new_start, new_end = new_start + head, new_end + head
+        if ranges and old_start - ranges[-1][1] <= 1:
+            ranges[-1][1] = old_end
+            ranges[-1][3] = new_end
+        else:
+            ranges.append([old_start, old_end, new_start, new_end])
+
+    changes = [
+        {"start": old_start, "end": old_end, "text": "".join(new_lines[start:end])}
+        for old_start, old_end, start, end in ranges
+    ]
+    return {"changes": changes}
@@ -3,10 +3,11 @@
 import logging
 import os
 
+from functools import lru_cache
 from html import escape
 from typing import List, Dict, Any
 
-from jedi import Script, Project
+from jedi import Script, Project, get_default_project
 from jedi.api.classes import Completion as JediCompletion
 from jedi.api.classes import Name as JediName
 
@@ -18,11 +19,22 @@ STREAM_HANDLER.setFormatter(logging.Formatter(LOG_TEMPLATE))
 LOGGER.addHandler(STREAM_HANDLER)
 
 
+@lru_cache(maxsize=32)
+def get_project(path: str) -> Project:
+    """get project, environment probed by project is reused"""
+    return Project(path)
+
+
+@lru_cache(maxsize=32)
+def _get_default_project(path: str) -> Project:
+    return get_default_project(path)
+
+
 class Service:
     def __init__(self, *, project_path=None):
 
         self.project = (
-            Project(project_path)
+            get_project(project_path)
             if project_path and os.path.exists(project_path)
             else None
         )
@@ -31,51 +43,56 @@ class Service:
 
     def change_workspace(self, project_path):
         self.project = (
-            Project(project_path)
+            get_project(project_path)
             if project_path and os.path.exists(project_path)
             else None
         )
         self._source = ""
         self.script = None
 
-    def complete(self, source, row, col) -> List[JediCompletion]:
+    def _get_script(self, source) -> Script:
         if not self._source.startswith(source):
             self._source = source
-            self.script = Script(self._source, project=self.project)
+            # jedi create new default project each Script if project undefined
+            project = self.project or _get_default_project(os.getcwd())
+            self.script = Script(self._source, project=project)
+        return self.script
 
-        return self.script.complete(row, col)
+    def complete(self, source, row, col) -> List[JediCompletion]:
+        return self._get_script(source).complete(row, col)
 
     def hover(self, source, row, col) -> List[JediName]:
-        if not self._source.startswith(source):
-            self._source = source
-            self.script = Script(self._source, project=self.project)
-
-        return self.script.help(row, col)
+        return self._get_script(source).help(row, col)
 
 
 def completion_to_rpc(completions: List[JediCompletion]) -> Dict[str, Any]:
     """build completion rpc"""
 
-    def build_completion(completion: JediCompletion):
+    # build in single pass, skip completion failed to parse
+    results = []
+    for completion in completions:
         try:
+            label = completion.name
             completion_type = completion.type
             annotation = (
                 completion._get_docstring_signature()
                 if completion_type in {"class", "function"}
                 else ""
             )
-            return {
-                "label": completion.name,
+        except Exception as err:
+            LOGGER.debug("parsing completion error: %r", err)
+            continue
+
+        results.append(
+            {
+                "label": label,
                 "annotation": annotation,
                 "type": completion_type,
             }
-        except Exception as err:
-            LOGGER.debug("parsing completion error: %s", repr(err))
-            return None
+        )
 
-    results = [build_completion(item) for item in completions]
     LOGGER.debug("results: %s", results)
-    return [result for result in results if result]
+    return results
 
 
 def escape_characters(s: str):
@@ -87,7 +104,7 @@ def documentation_to_rpc(names: List[JediName]) -> Dict[str, Any]:
     """build documentation rpc"""
 
     def build_documentation(name: JediName) -> str:
-        LOGGER.debug(f"name: {repr(name)}")
+        LOGGER.debug("name: %r", name)
         try:
             module_name = name.module_name
             module_path = name.module_path
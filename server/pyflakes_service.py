@@ -1,8 +1,7 @@
 """handle diagnostic service using pyflakes"""
 
 import logging
-import re
-from typing import Tuple
+from typing import Any, Dict, List
 from io import StringIO
 from pyflakes.api import check
 from pyflakes.reporter import Reporter
@@ -14,48 +13,63 @@ LOG_TEMPLATE = "%(levelname)s %(asctime)s %(filename)s:%(lineno)s  %(message)s"
 STREAM_HANDLER.setFormatter(logging.Formatter(LOG_TEMPLATE))
 LOGGER.addHandler(STREAM_HANDLER)
 
-WarningMsg = str
-ErrorMsg = str
 
+class DiagnosticReporter(Reporter):
+    """collect pyflakes report without formatting to text"""
 
-def publish_diagnostic(source: str, file_name=None) -> Tuple[WarningMsg, ErrorMsg]:
-    file_name = file_name or "<stdin>"
+    def __init__(self):
+        super().__init__(StringIO(), StringIO())
+        self.warnings = []
+        self.errors = []
+
+    def flake(self, message):
+        self.warnings.append(message)
+
+    def syntaxError(self, filename, msg, lineno, offset, text):
+        # write error source line and column marker to buffer
+        super().syntaxError(filename, msg, lineno, offset, text)
+        _, _, detail = self._stderr.getvalue().partition("\n")
+        self._stderr.seek(0)
+        self._stderr.truncate()
+
+        lineno = max(lineno or 0, 1)
+        offset = max(offset, 1) if offset is not None else 0
+        self.errors.append((filename, lineno, offset, f"{msg}\n\n{detail}"))
+
+    def unexpectedError(self, filename, msg):
+        LOGGER.debug("unexpected error %s: %s", filename, msg)
 
-    warning_buffer = StringIO()
-    error_buffer = StringIO()
-    reporter = Reporter(warning_buffer, error_buffer)
 
+def publish_diagnostic(source: str, file_name=None) -> DiagnosticReporter:
+    file_name = file_name or "<stdin>"
+
+    reporter = DiagnosticReporter()
     check(source, file_name, reporter)
-    LOGGER.debug("warning message: \n%s", warning_buffer.getvalue())
-    LOGGER.debug("error message: \n%s", error_buffer.getvalue())
-
-    return (warning_buffer.getvalue(), error_buffer.getvalue())
-
-
-def diagnostic_to_rpc(messages: Tuple[WarningMsg, ErrorMsg]):
-    def build_rpc():
-        warning_pattern = re.compile(r"(.*):(\d+):(\d+) (.*)")
-        error_pattern = re.compile(r"(.*):(\d+):(\d+): (.*)")
-
-        for line in messages[0].splitlines():
-            match = warning_pattern.match(line)
-            if match:
-                yield {
-                    "severity": "warning",
-                    "path": match.group(1),
-                    "line": int(match.group(2)) - 1,  # editor use 0-based line index
-                    "column": int(match.group(3)),
-                    "message": match.group(4),
-                }
-
-        match = error_pattern.match(messages[1])
-        if match:
-            yield {
-                "severity": "error",
-                "path": match.group(1),
-                "line": int(match.group(2)) - 1,  # editor use 0-based line index
-                "column": int(match.group(3)),
-                "message": f"{match.group(4)}\n{messages[1][match.end():]}",
-            }
-
-    return list(build_rpc())
+    LOGGER.debug("warning message: \n%s", reporter.warnings)
+    LOGGER.debug("error message: \n%s", reporter.errors)
+
+    return reporter
+
+
+def diagnostic_to_rpc(report: DiagnosticReporter) -> List[Dict[str, Any]]:
+    diagnostics = [
+        {
+            "severity": "warning",
+            "path": message.filename,
+            "line": message.lineno - 1,  # editor use 0-based line index
+            "column": message.col + 1,  # same as reported syntax error offset
+            "message": message.message % message.message_args,
+        }
+        for message in report.warnings
+    ]
+    diagnostics.extend(
+        {
+            "severity": "error",
+            "path": path,
+            "line": line - 1,  # editor use 0-based line index
+            "column": column,
+            "message": message,
+        }
+        for path, line, column, message in report.errors
+    )
+    return diagnostics